@@ -1,8 +1,17 @@
 import bcrypt
 import re
+from config import BCRYPT_ROUNDS
+
+# Whole policy in one pass; the per-rule patterns below only run on failure
+# to say which rule was missed.
+_PW_OK = re.compile(r"(?=.*[A-Z])(?=.*[a-z])(?=.*\d)(?=.*[^\w\s]).{10,}", re.DOTALL)
+_PW_UPPER = re.compile(r"[A-Z]")
+_PW_LOWER = re.compile(r"[a-z]")
+_PW_DIGIT = re.compile(r"\d")
+_PW_SYMBOL = re.compile(r"[^\w\s]")
 
 def hash_pwd(pwd: str) -> bytes:
-    return bcrypt.hashpw(pwd.encode("utf-8"), bcrypt.gensalt())
+    return bcrypt.hashpw(pwd.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
 
 def verify_pwd(pwd: str, hp: bytes) -> bool:
     try:
@@ -15,9 +24,10 @@ def verify_pwd(pwd: str, hp: bytes) -> bool:
 def validate_password_policy(pw: str) -> str | None:
     if not pw: return "Password cannot be empty."
     s = str(pw)
+    if _PW_OK.fullmatch(s): return None
     if len(s) < 10: return "Password must be at least 10 characters."
-    if not re.search(r"[A-Z]", s): return "Include at least one uppercase letter."
-    if not re.search(r"[a-z]", s): return "Include at least one lowercase letter."
-    if not re.search(r"\d", s): return "Include at least one digit."
-    if not re.search(r"[^\w\s]", s): return "Include at least one symbol."
+    if not _PW_UPPER.search(s): return "Include at least one uppercase letter."
+    if not _PW_LOWER.search(s): return "Include at least one lowercase letter."
+    if not _PW_DIGIT.search(s): return "Include at least one digit."
+    if not _PW_SYMBOL.search(s): return "Include at least one symbol."
     return None
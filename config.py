@@ -36,5 +36,8 @@ SHOP_TEL = "Tel : 089-763778, H/P: 0168260533"
 # If you have a logo.jpg in the same folder, set this to os.path.join(APP_DIR, "logo.jpg")
 LOGO_PATH = "" 
 DEFAULT_BASE_VID = 41000
+# bcrypt work factor for new password hashes. Existing hashes keep the cost
+# they were created with, so raising this later only affects new passwords.
+BCRYPT_ROUNDS = 10
 FONT_FAMILY = "Segoe UI"
 UI_FONT_SIZE = 14
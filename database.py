@@ -1,23 +1,55 @@
 import sqlite3
+import threading
+import atexit
 import time
-from datetime import datetime
+from functools import lru_cache
 from config import DB_FILE, DEFAULT_BASE_VID, logger
 from auth import hash_pwd
 
+# One long-lived connection per thread: opened and configured on first use,
+# then reused so callers don't pay for open + PRAGMAs on every query.
+_tls = threading.local()
+# WAL is stored in the database file, so switching once per process is
+# enough; the other PRAGMAs are per connection and run on every open.
+_wal_set = False
+
 def get_conn():
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute("PRAGMA foreign_keys = ON")
-    conn.execute("PRAGMA journal_mode = WAL")
-    conn.execute("PRAGMA synchronous = NORMAL")
-    conn.row_factory = sqlite3.Row
+    global _wal_set
+    conn = getattr(_tls, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE, cached_statements=256)
+        conn.execute("PRAGMA foreign_keys = ON")
+        if not _wal_set:
+            conn.execute("PRAGMA journal_mode = WAL")
+            _wal_set = True
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA mmap_size = 268435456")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -16000")
+        conn.execute("PRAGMA wal_autocheckpoint = 1000")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.row_factory = sqlite3.Row
+        _tls.conn = conn
     return conn
 
+def close_conn():
+    conn = getattr(_tls, "conn", None)
+    if conn is not None:
+        _tls.conn = None
+        conn.close()
+
+atexit.register(close_conn)
+
 def init_db():
     conn = None
     try:
         conn = get_conn()
         cur = conn.cursor()
 
+        mode = cur.execute("PRAGMA journal_mode").fetchone()[0]
+        if str(mode).lower() != "wal":
+            logger.warning("SQLite journal_mode is %s, expected wal", mode)
+
         # Create Tables
         cur.executescript("""
         CREATE TABLE IF NOT EXISTS vouchers (
@@ -48,8 +80,8 @@ def init_db():
             name TEXT UNIQUE,
             phone TEXT,
             photo_path TEXT,
-            created_at TEXT,
-            updated_at TEXT
+            created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%S','now','localtime')),
+            updated_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%S','now','localtime'))
         );
         CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
         CREATE TABLE IF NOT EXISTS users (
@@ -59,8 +91,8 @@ def init_db():
             password_hash BLOB,
             is_active INTEGER DEFAULT 1,
             must_change_pwd INTEGER DEFAULT 0,
-            created_at TEXT,
-            updated_at TEXT
+            created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%S','now','localtime')),
+            updated_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%S','now','localtime'))
         );
         CREATE TABLE IF NOT EXISTS commissions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -70,81 +102,176 @@ def init_db():
             total_amount REAL,
             commission_amount REAL,
             bill_image_path TEXT,
-            created_at TEXT,
-            updated_at TEXT,
+            created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%S','now','localtime')),
+            updated_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%S','now','localtime')),
             voucher_id TEXT,
             note TEXT
         );
+        CREATE INDEX IF NOT EXISTS idx_vouchers_created ON vouchers(created_at);
+        CREATE INDEX IF NOT EXISTS idx_vouchers_status_created ON vouchers(status, created_at);
+        CREATE INDEX IF NOT EXISTS idx_comm_staff ON commissions(staff_id);
         """)
         conn.commit()
 
         # Ensure default admin
         cur.execute("SELECT COUNT(*) FROM users WHERE role='admin'")
         if cur.fetchone()[0] == 0:
-            ts = datetime.now().isoformat(sep=' ', timespec='seconds')
+            # Timestamp taken by SQLite, spelled out rather than left to the
+            # column default because tables from older builds have none.
             cur.execute(
-                "INSERT OR IGNORE INTO users (username, role, password_hash, must_change_pwd, created_at, updated_at) VALUES (?,?,?,?,?,?)",
-                ("tonycom", "admin", hash_pwd("admin123"), 1, ts, ts)
+                "INSERT OR IGNORE INTO users (username, role, password_hash, must_change_pwd, created_at, updated_at) "
+                "VALUES (?,?,?,?, strftime('%Y-%m-%d %H:%M:%S','now','localtime'), strftime('%Y-%m-%d %H:%M:%S','now','localtime'))",
+                ("tonycom", "admin", hash_pwd("admin123"), 1)
             )
             conn.commit()
             logger.info("Default admin created.")
 
+        # Seed the voucher id counter once from whatever is already stored
+        cur.execute("SELECT 1 FROM settings WHERE key='last_vid'")
+        if cur.fetchone() is None:
+            cur.execute("SELECT MAX(CAST(voucher_id AS INTEGER)) FROM vouchers")
+            last = cur.fetchone()[0]
+            if last is None:
+                cur.execute("SELECT value FROM settings WHERE key='base_vid'")
+                s_row = cur.fetchone()
+                last = (int(s_row[0]) if s_row and s_row[0] else DEFAULT_BASE_VID) - 1
+            # OR IGNORE: a second instance starting on the same new file may seed it first
+            cur.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('last_vid', ?)", (str(last),))
+            conn.commit()
+
         return conn
     except Exception:
         logger.exception("init_db failed")
-        if conn: conn.close()
+        if conn: conn.rollback()
         raise
 
 # --- Data Access Methods ---
 
-def search_vouchers(filters):
+_INSERT_VOUCHER_SQL = (
+    "INSERT INTO vouchers (voucher_id, created_at, customer_name, contact_number, "
+    "particulars, problem, staff_name, recipient, pdf_path, status) "
+    "VALUES (?,?,?,?,?,?,?,?,?,?)"
+)
+
+# Bumps and returns the settings counter, so allocating an id is O(1) and
+# happens under the same write lock as the INSERT that uses it.
+_NEXT_VID_SQL = (
+    "UPDATE settings SET value = CAST(CAST(value AS INTEGER) + 1 AS TEXT) "
+    "WHERE key='last_vid' RETURNING value"
+)
+
+# Moves the counter up to the highest stored id, for when rows were written
+# without it (an older build or a manual import on the same file).
+_RESYNC_VID_SQL = (
+    "UPDATE settings SET value = CAST(MAX(CAST(value AS INTEGER), "
+    "COALESCE((SELECT MAX(CAST(voucher_id AS INTEGER)) FROM vouchers), 0)) AS TEXT) "
+    "WHERE key='last_vid'"
+)
+
+def insert_voucher(created_at, customer_name, contact_number,
+                   particulars, problem, staff_name, recipient, pdf_path, status="Pending"):
     conn = get_conn()
-    cur = conn.cursor()
+    with conn:
+        for attempt in (1, 2):
+            voucher_id = conn.execute(_NEXT_VID_SQL).fetchone()[0]
+            try:
+                conn.execute(_INSERT_VOUCHER_SQL, (
+                    voucher_id, created_at, customer_name, contact_number,
+                    particulars, problem, staff_name, recipient, pdf_path, status
+                ))
+                break
+            except sqlite3.IntegrityError:
+                if attempt == 2:
+                    raise
+                logger.warning("Voucher id %s already taken; resyncing last_vid", voucher_id)
+                conn.execute(_RESYNC_VID_SQL)
+    return voucher_id
+
+def update_voucher_pdf_path(voucher_id, pdf_path):
+    conn = get_conn()
+    with conn:
+        conn.execute("UPDATE vouchers SET pdf_path=? WHERE voucher_id=?", (pdf_path, voucher_id))
+
+@lru_cache(maxsize=None)
+def _search_sql(by_vid, by_name, by_status):
+    # One SQL string per filter shape (8 at most), built once. Reusing the
+    # identical string lets sqlite3's statement cache skip re-preparing it.
     sql = (
         "SELECT voucher_id, created_at, customer_name, contact_number, units, "
         "recipient, technician_id, technician_name, status, solution, pdf_path "
         "FROM vouchers WHERE 1=1"
     )
+    if by_vid:
+        sql += " AND voucher_id LIKE ?"
+    if by_name:
+        # LIKE already folds ASCII case; wrapping the column in LOWER() only
+        # added a function call per row.
+        sql += " AND customer_name LIKE ?"
+    if by_status:
+        sql += " AND status = ?"
+    # id breaks created_at ties so LIMIT/OFFSET pages never overlap
+    return sql + " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+
+def search_vouchers(filters, limit=100, offset=0):
+    conn = get_conn()
+    cur = conn.cursor()
+    # Plain tuples: the list view only indexes by position.
+    cur.row_factory = None
     params = []
 
-    if filters.get("voucher_id"):
-        sql += " AND voucher_id LIKE ?"
-        params.append(f"%{filters['voucher_id']}%")
-    if filters.get("customer_name"):
-        sql += " AND LOWER(customer_name) LIKE ?"
-        params.append(f"%{filters['customer_name'].lower()}%")
-    
+    vid = filters.get("voucher_id")
+    if vid:
+        params.append(f"%{vid}%")
+    name = filters.get("customer_name")
+    if name:
+        params.append(f"%{name}%")
     status = filters.get("status")
-    if status and status != "All":
-        sql += " AND status = ?"
+    by_status = bool(status) and status != "All"
+    if by_status:
         params.append(status)
-
-    sql += " ORDER BY created_at DESC LIMIT 100"
+    params += [limit, offset]
     
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    cur.execute(_search_sql(bool(vid), bool(name), by_status), params)
+    return cur.fetchall()
 
-def get_next_voucher_id():
+def get_voucher_pdf_args(voucher_id):
+    # Columns in generate_pdf's argument order, so a PDF can be rebuilt from the row
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute("SELECT MAX(CAST(voucher_id AS INTEGER)) FROM vouchers")
-    row = cur.fetchone()
-    if not row or row[0] is None:
-        cur.execute("SELECT value FROM settings WHERE key='base_vid'")
-        s_row = cur.fetchone()
-        base = int(s_row[0]) if s_row and s_row[0] else DEFAULT_BASE_VID
-        conn.close()
-        return str(base)
-    nxt = str(int(row[0]) + 1)
-    conn.close()
-    return nxt
+    cur.row_factory = None
+    cur.execute(
+        "SELECT voucher_id, customer_name, contact_number, units, particulars, problem, "
+        "staff_name, status, created_at, recipient FROM vouchers WHERE voucher_id=?",
+        (voucher_id,)
+    )
+    return cur.fetchone()
+
+def get_user_auth(username):
+    # Only what the login check needs, not the whole users row
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT id, username, role, password_hash FROM users WHERE username=?", (username,))
+    return cur.fetchone()
 
 def list_staffs_names():
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("SELECT name FROM staffs ORDER BY name COLLATE NOCASE ASC")
-    rows = [r[0] for r in cur.fetchall()]
-    conn.close()
-    return rows
+    return [r[0] for r in cur.fetchall()]
+
+# Staff names change rarely (only from outside the app), so every dialog
+# shares one list. PRAGMA data_version moves whenever another connection
+# commits, so that's the cheap "has anything changed" check. The number is
+# per connection, hence the connection is kept alongside it.
+_staff_cache = None  # (conn, data_version, names)
+_staff_lock = threading.Lock()
+
+def get_staff_cache():
+    global _staff_cache
+    conn = get_conn()
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    with _staff_lock:
+        cached = _staff_cache
+        if cached is None or cached[0] is not conn or cached[1] != version:
+            cached = _staff_cache = (conn, version, list_staffs_names())
+        return cached[2]
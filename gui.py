@@ -1,22 +1,40 @@
 import tkinter as tk
 import customtkinter as ctk
 from tkinter import ttk, messagebox, simpledialog
-import threading
+from concurrent.futures import ThreadPoolExecutor
 import os
 import sys
-import webbrowser
+import subprocess
 from datetime import datetime
 
 from config import FONT_FAMILY, UI_FONT_SIZE, PDF_DIR, logger
-from database import get_conn, search_vouchers, list_staffs_names, get_next_voucher_id
+from database import (get_user_auth, search_vouchers, insert_voucher, update_voucher_pdf_path,
+                      get_voucher_pdf_args, get_staff_cache)
 from auth import verify_pwd, validate_password_policy, hash_pwd
 from pdf_utils import generate_pdf
 
+# Rows fetched per search page; more are loaded as the list is scrolled
+PAGE_SIZE = 200
+
+# Native "open with default app" command, picked once; Windows uses os.startfile
+_OPEN_CMD = (["open"] if sys.platform == "darwin"
+             else None if sys.platform.startswith("win")
+             else ["xdg-open"])
+
+# Worker for blocking calls (bcrypt, DB) so the Tk mainloop keeps painting
+_bg_pool = ThreadPoolExecutor(max_workers=1)
+
 def white_btn(parent, **kwargs):
     kwargs.setdefault("fg_color", "white")
     kwargs.setdefault("text_color", "black")
     return ctk.CTkButton(parent, **kwargs)
 
+def labeled_row(parent, text, widget, pady=(0, 10)):
+    # Caption above a full-width widget: the layout every form here uses
+    ctk.CTkLabel(parent, text=text).pack(anchor="w")
+    widget.pack(fill="x", pady=pady)
+    return widget
+
 class LoginDialog(ctk.CTkToplevel):
     def __init__(self, master):
         super().__init__(master)
@@ -28,28 +46,42 @@ class LoginDialog(ctk.CTkToplevel):
         frm = ctk.CTkFrame(self)
         frm.pack(fill="both", expand=True, padx=20, pady=20)
         
-        ctk.CTkLabel(frm, text="Username").pack(anchor="w")
-        self.e_user = ctk.CTkEntry(frm)
-        self.e_user.pack(fill="x", pady=(0, 10))
-        
-        ctk.CTkLabel(frm, text="Password").pack(anchor="w")
-        self.e_pwd = ctk.CTkEntry(frm, show="*")
-        self.e_pwd.pack(fill="x", pady=(0, 20))
+        self.e_user = labeled_row(frm, "Username", ctk.CTkEntry(frm))
+        self.e_pwd = labeled_row(frm, "Password", ctk.CTkEntry(frm, show="*"), pady=(0, 20))
         
-        ctk.CTkButton(frm, text="Login", command=self._login).pack(fill="x")
+        self.btn_login = ctk.CTkButton(frm, text="Login", command=self._login)
+        self.btn_login.pack(fill="x")
         self.result = None
 
     def _login(self):
         u = self.e_user.get()
         p = self.e_pwd.get()
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id, username, role, password_hash FROM users WHERE username=?", (u,))
-        row = cur.fetchone()
-        conn.close()
-        
-        if row and verify_pwd(p, row["password_hash"]):
-            self.result = {"id": row["id"], "username": row["username"], "role": row["role"]}
+        
+        def _check():
+            row = get_user_auth(u)
+            if row and verify_pwd(p, row["password_hash"]):
+                return {"id": row["id"], "username": row["username"], "role": row["role"]}
+            return None
+        
+        # bcrypt is deliberately slow; keep it off the Tk thread
+        self.btn_login.configure(state="disabled", text="Checking...")
+        self._wait_login(_bg_pool.submit(_check))
+
+    def _wait_login(self, fut):
+        if not self.winfo_exists():
+            return  # dialog closed while the check was running
+        if not fut.done():
+            self.after(50, self._wait_login, fut)
+            return
+        self.btn_login.configure(state="normal", text="Login")
+        try:
+            result = fut.result()
+        except Exception:
+            logger.exception("Login check failed")
+            result = None
+        
+        if result:
+            self.result = result
             self.destroy()
         else:
             messagebox.showerror("Error", "Invalid credentials")
@@ -61,6 +93,16 @@ class VoucherApp(ctk.CTk):
         self.geometry("1100x700")
         
         self.user = None
+        self._pdf_paths = {}
+        self._rendered_pdfs = {}
+        self._filters = {}
+        self._offset = 0
+        self._has_more = False
+        self._loading = False
+        self._search_gen = 0
+        self._voucher_win = None
+        self._voucher_entries = {}
+        self._voucher_cb = None
         self._login()
         
         # Layout
@@ -96,6 +138,22 @@ class VoucherApp(ctk.CTk):
         self.btn_search.pack(side="left", padx=10)
         
         ctk.CTkButton(frm, text="Reset", command=self.reset, fg_color="gray").pack(side="left")
+        
+        # Search as the user types, once they pause
+        self._search_job = None
+        self.e_vid.bind("<KeyRelease>", self._schedule_search)
+        self.e_name.bind("<KeyRelease>", self._schedule_search)
+
+    def _schedule_search(self, _event=None):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+            self._search_job = None
+        # Tab, Shift, arrows etc. don't change the text; re-searching would
+        # only throw away the pages already loaded
+        if (self.e_vid.get() == self._filters.get("voucher_id")
+                and self.e_name.get() == self._filters.get("customer_name")):
+            return
+        self._search_job = self.after(150, self.perform_search)
 
     def _build_table(self):
         frm = ctk.CTkFrame(self)
@@ -109,9 +167,9 @@ class VoucherApp(ctk.CTk):
             
         self.tree.pack(fill="both", expand=True, side="left")
         
-        sb = ttk.Scrollbar(frm, command=self.tree.yview)
-        sb.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=sb.set)
+        self.vsb = ttk.Scrollbar(frm, command=self.tree.yview)
+        self.vsb.pack(side="right", fill="y")
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
         
         self.tree.bind("<Double-1>", lambda e: self.open_pdf())
 
@@ -123,26 +181,59 @@ class VoucherApp(ctk.CTk):
         ctk.CTkButton(frm, text="Open PDF", command=self.open_pdf).pack(side="left", padx=5)
 
     def perform_search(self):
-        filters = {
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+            self._search_job = None
+        self._filters = {
             "voucher_id": self.e_vid.get(),
             "customer_name": self.e_name.get(),
             "status": "All"
         }
-        
-        def _bg():
-            try:
-                rows = search_vouchers(filters)
-                self.after(0, lambda: self._update_tree(rows))
-            except Exception as e:
-                logger.error(f"Search failed: {e}")
-        
-        threading.Thread(target=_bg, daemon=True).start()
+        self._search_gen += 1
+        self._load_page(reset=True)
+
+    def _load_page(self, reset):
+        filters, gen = self._filters, self._search_gen
+        offset = 0 if reset else self._offset
+        self._loading = True
+        # Shared worker instead of a thread per search: its connection is
+        # opened once, and only the Tk thread touches widgets.
+        fut = _bg_pool.submit(search_vouchers, filters, limit=PAGE_SIZE, offset=offset)
+        self._wait_page(fut, reset, gen)
+
+    def _wait_page(self, fut, reset, gen):
+        if not fut.done():
+            self.after(20, self._wait_page, fut, reset, gen)
+            return
+        try:
+            rows = fut.result()
+        except Exception as e:
+            logger.error(f"Search failed: {e}")
+            self._loading = False
+            return
+        self._update_tree(rows, reset, gen)
 
-    def _update_tree(self, rows):
-        self.tree.delete(*self.tree.get_children())
+    def _on_tree_scroll(self, first, last):
+        self.vsb.set(first, last)
+        if float(last) >= 0.9 and self._has_more and not self._loading:
+            self._load_page(reset=False)
+
+    def _update_tree(self, rows, reset=True, gen=None):
+        if gen is not None and gen != self._search_gen:
+            return  # a newer search superseded this page
+        self._loading = False
+        if reset:
+            self.tree.delete(*self.tree.get_children())
+            self._pdf_paths = {}
+            self._offset = 0
+        self._offset += len(rows)
+        self._has_more = len(rows) == PAGE_SIZE
+        insert, paths, rendered = self.tree.insert, self._pdf_paths, self._rendered_pdfs
         for r in rows:
             # row: voucher_id, created, name, contact, ... status ... pdf
-            self.tree.insert("", "end", values=(r[0], r[1][:10], r[2], r[3], r[8], r[10]))
+            iid = insert("", "end", values=(r[0], r[1][:10], r[2], r[3], r[8]))
+            # A render can finish before its row is listed; fill the path in here
+            paths[iid] = r[10] or rendered.get(r[0])
 
     def reset(self):
         self.e_vid.delete(0, "end")
@@ -152,62 +243,101 @@ class VoucherApp(ctk.CTk):
     def open_pdf(self):
         sel = self.tree.selection()
         if not sel: return
-        # The stored rows in tree don't contain PDF path in displayed cols, 
-        # but I packed it in previous logic? Let's fix search_vouchers return.
-        # It returns ... status, solution, pdf_path. 
-        # tree values are tuples. 
-        # We need to fetch the full row or store path hidden.
-        # Simplified: fetch path from DB by ID.
-        vid = self.tree.item(sel[0])["values"][0]
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT pdf_path FROM vouchers WHERE voucher_id=?", (vid,))
-        row = cur.fetchone()
-        conn.close()
-        
-        if row and row[0] and os.path.exists(row[0]):
-            webbrowser.open(row[0])
+        # pdf_path came back with the search; no need to ask the DB again
+        path = self._pdf_paths.get(sel[0])
+        
+        if path and os.path.exists(path):
+            self._open_path(path)
         else:
-            messagebox.showerror("Error", "PDF not found")
+            # Render failed or the file was removed: rebuild it from the row
+            self._render_pdf(self.tree.set(sel[0], "ID"), open_when_done=True)
+
+    def _open_path(self, path):
+        try:
+            if _OPEN_CMD is None:
+                os.startfile(path)
+            else:
+                subprocess.Popen(_OPEN_CMD + [path])
+        except OSError as e:
+            # No PDF app associated / opener missing; the windowed build has no console
+            logger.error(f"Could not open {path}: {e}")
+            messagebox.showerror("Error", f"Could not open the PDF:\n{path}")
 
     def add_voucher_ui(self):
+        # The dialog is built once and hidden on close; reopening just clears it
+        if self._voucher_win is not None and self._voucher_win.winfo_exists():
+            self._reset_voucher_form()
+            self._voucher_win.deiconify()
+            self._voucher_win.lift()
+            self._voucher_win.focus()
+            return
+        
         top = ctk.CTkToplevel(self)
         top.title("New Voucher")
         top.geometry("500x550")
+        top.protocol("WM_DELETE_WINDOW", top.withdraw)
+        self._voucher_win = top
         
         frm = ctk.CTkFrame(top)
         frm.pack(fill="both", expand=True, padx=20, pady=20)
         
-        entries = {}
-        for label in ["Customer Name", "Contact", "Particulars", "Problem"]:
-            ctk.CTkLabel(frm, text=label).pack(anchor="w")
-            e = ctk.CTkEntry(frm)
-            e.pack(fill="x", pady=(0, 10))
-            entries[label] = e
-            
-        ctk.CTkLabel(frm, text="Recipient").pack(anchor="w")
-        cb = ctk.CTkComboBox(frm, values=list_staffs_names())
-        cb.pack(fill="x", pady=(0, 20))
+        entries = {label: labeled_row(frm, label, ctk.CTkEntry(frm))
+                   for label in ["Customer Name", "Contact", "Particulars", "Problem"]}
+        cb = labeled_row(frm, "Recipient", ctk.CTkComboBox(frm, values=get_staff_cache()), pady=(0, 20))
+        self._voucher_entries, self._voucher_cb = entries, cb
         
         def save():
-            vid = get_next_voucher_id()
             ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            pdf = generate_pdf(vid, entries["Customer Name"].get(), entries["Contact"].get(), 1,
-                               entries["Particulars"].get(), entries["Problem"].get(), 
-                               cb.get(), "Pending", ts, cb.get())
+            name, contact = entries["Customer Name"].get(), entries["Contact"].get()
+            part, prob = entries["Particulars"].get(), entries["Problem"].get()
+            staff = cb.get()
             
-            conn = get_conn()
-            conn.execute("""
-                INSERT INTO vouchers (voucher_id, created_at, customer_name, contact_number, 
-                particulars, problem, staff_name, recipient, pdf_path, status)
-                VALUES (?,?,?,?,?,?,?,?,?,?)
-            """, (vid, ts, entries["Customer Name"].get(), entries["Contact"].get(), 
-                  entries["Particulars"].get(), entries["Problem"].get(), cb.get(), cb.get(), pdf, "Pending"))
-            conn.commit()
-            conn.close()
+            # Row first so the voucher exists even if rendering fails; the PDF
+            # is drawn off the Tk thread from the saved row, path filled in afterwards.
+            vid = insert_voucher(ts, name, contact, part, prob, staff, staff, None, "Pending")
             
             messagebox.showinfo("Success", f"Voucher {vid} created.")
-            top.destroy()
+            top.withdraw()
             self.perform_search()
+            self._render_pdf(vid)
             
         ctk.CTkButton(frm, text="Save", command=save).pack(fill="x")
+
+    def _render_pdf(self, vid, open_when_done=False):
+        def _render():
+            args = get_voucher_pdf_args(vid)
+            if args is None:
+                raise LookupError(f"voucher {vid} not found")
+            pdf = generate_pdf(*args)
+            update_voucher_pdf_path(vid, pdf)
+            return pdf
+        
+        self._wait_render(_bg_pool.submit(_render), vid, open_when_done)
+
+    def _wait_render(self, fut, vid, open_when_done):
+        if not fut.done():
+            self.after(100, self._wait_render, fut, vid, open_when_done)
+            return
+        try:
+            pdf = fut.result()
+        except Exception as e:
+            logger.error(f"PDF for voucher {vid} failed: {e}")
+            messagebox.showerror("Error", f"The PDF for voucher {vid} could not be created.\n"
+                                          "Open PDF will try again.")
+            return
+        # Kept for rows listed later; patch the row if it's already shown
+        # (a fresh search would drop scrolled-in pages)
+        self._rendered_pdfs[vid] = pdf
+        for iid in self._pdf_paths:
+            if self.tree.set(iid, "ID") == str(vid):
+                self._pdf_paths[iid] = pdf
+                break
+        if open_when_done:
+            self._open_path(pdf)
+
+    def _reset_voucher_form(self):
+        for e in self._voucher_entries.values():
+            e.delete(0, "end")
+        names = get_staff_cache()
+        self._voucher_cb.configure(values=names)
+        self._voucher_cb.set(names[0] if names else "")
@@ -1,83 +1,155 @@
+import io
 import os
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas as rl_canvas 
 from reportlab.lib.units import mm
 from reportlab.platypus import Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
 from datetime import datetime
 from config import PDF_DIR, SHOP_NAME, SHOP_ADDR, SHOP_TEL, LOGO_PATH, logger
 
 _styles = getSampleStyleSheet()
 _styleN = _styles["Normal"]
 
+def _load_logo():
+    if not (LOGO_PATH and os.path.exists(LOGO_PATH)):
+        return None
+    try:
+        reader = ImageReader(LOGO_PATH)
+        reader.getRGBData()  # full decode, so a corrupt/truncated file fails here and not mid-voucher
+        return reader
+    except Exception:
+        logger.exception("Could not load logo %s", LOGO_PATH)
+        return None
+
+# Opened once per process instead of once per voucher
+_LOGO_READER = _load_logo()
+
+# ------------------ Layout ------------------
+# The voucher is a fixed A4 layout, so every coordinate is worked out here once.
+_PAGE_W, _PAGE_H = A4
+_LEFT, _RIGHT = 12 * mm, _PAGE_W - 12 * mm
+_TOP_Y = _PAGE_H - 15 * mm
+_HALF_W = (_RIGHT - _LEFT) / 2
+
+_LOGO_BOX = (_RIGHT - 28 * mm, _TOP_Y - 18 * mm, 28 * mm, 18 * mm)
+_ADDR_Y = _TOP_Y - 5 * mm
+_ADDR_LEADING = 4 * mm
+_TITLE_X = _PAGE_W / 2
+_TITLE_Y = _TOP_Y - 16 * mm
+
+_CUSTOMER_Y = _TOP_Y - 30 * mm
+_CONTACT_Y = _CUSTOMER_Y - 8 * mm
+_BOX_Y = _CONTACT_Y - 15 * mm
+_BOX_RECT = (_LEFT, _BOX_Y - 40 * mm, _RIGHT - _LEFT, 45 * mm)
+_PART_X = _LEFT + 2 * mm
+_PROB_X = _LEFT + _HALF_W + 2 * mm
+_PROB_W = _HALF_W - 4 * mm
+_WRAP_Y = _BOX_Y - 18 * mm
+_WRAP_H = 15 * mm
+
+_SIG_Y = 30 * mm
+_SIG_CAPTION_Y = _SIG_Y - 4 * mm
+_SIG_L_END = _LEFT + 60 * mm
+_SIG_R_START = _RIGHT - 60 * mm
+
+# ParagraphStyles keyed by (fontsize, bold), cloned once instead of per call
+_STYLE_CACHE = {}
+
+def _wrap_style(fontsize, bold):
+    style = _STYLE_CACHE.get((fontsize, bold))
+    if style is None:
+        style = _styleN.clone('wrap')
+        style.fontName = "Helvetica-Bold" if bold else "Helvetica"
+        style.fontSize = fontsize
+        style.leading = fontsize + 2
+        _STYLE_CACHE[(fontsize, bold)] = style
+    return style
+
 def draw_wrapped(c, text, x, y, w, h, fontsize=10, bold=False):
-    style = _styleN.clone('wrap')
-    style.fontName = "Helvetica-Bold" if bold else "Helvetica"
-    style.fontSize = fontsize
-    style.leading = fontsize + 2
-    para = Paragraph((text or "-").replace("\n", "<br/>"), style)
+    style = _wrap_style(fontsize, bold)
+    text = text or "-"
+    # Fast path: plain text that fits on one line doesn't need a Paragraph
+    # (markup parse + wrap). Same baseline and whitespace handling as one.
+    if "\n" not in text and "<" not in text and "&" not in text:
+        line = " ".join(text.split())
+        if c.stringWidth(line, style.fontName, fontsize) <= w:
+            c.saveState()
+            c.setFont(style.fontName, fontsize)
+            c.drawString(x, y + h - fontsize, line)
+            c.restoreState()
+            return style.leading
+    para = Paragraph(text.replace("\n", "<br/>"), style)
     _, h_used = para.wrap(w, h)
     para.drawOn(c, x, y + h - h_used)
     return h_used
 
+def _draw_voucher(c, voucher_id, customer_name, contact_number, units,
+                  particulars, problem, staff_name, status, created_at, recipient):
+    # Isolate each page's graphics state so batched pages can't leak into each other
+    c.saveState()
+    draw, draw_c, draw_r = c.drawString, c.drawCentredString, c.drawRightString
+    set_font, line = c.setFont, c.line
+    
+    # Header
+    if _LOGO_READER is not None:
+        c.drawImage(_LOGO_READER, *_LOGO_BOX, mask='auto')
+        
+    set_font("Helvetica-Bold", 14)
+    draw(_LEFT, _TOP_Y, SHOP_NAME)
+    # Address block as one text object: a single BT/ET with a line advance
+    t = c.beginText(_LEFT, _ADDR_Y)
+    t.setFont("Helvetica", 9, _ADDR_LEADING)
+    t.textLine(SHOP_ADDR)
+    t.textLine(SHOP_TEL)
+    c.drawText(t)
+    
+    set_font("Helvetica-Bold", 13)
+    draw_c(_TITLE_X, _TITLE_Y, "SERVICE VOUCHER")
+    draw_r(_RIGHT, _TITLE_Y, f"No : {voucher_id}")
+    
+    # Details
+    set_font("Helvetica", 10)
+    draw(_LEFT, _CUSTOMER_Y, f"Customer: {customer_name}")
+    draw_r(_RIGHT, _CUSTOMER_Y, f"Date: {created_at[:10]}")
+    
+    draw(_LEFT, _CONTACT_Y, f"Contact: {contact_number}")
+    
+    c.rect(*_BOX_RECT)
+    draw(_PART_X, _BOX_Y, "Particulars:")
+    draw_wrapped(c, particulars, _PART_X, _WRAP_Y, _HALF_W, _WRAP_H)
+    
+    draw(_PROB_X, _BOX_Y, "Problem:")
+    draw_wrapped(c, problem, _PROB_X, _WRAP_Y, _PROB_W, _WRAP_H)
+
+    # Footer
+    line(_LEFT, _SIG_Y, _SIG_L_END, _SIG_Y)
+    draw(_LEFT, _SIG_CAPTION_Y, "Recipient Signature")
+    
+    line(_SIG_R_START, _SIG_Y, _RIGHT, _SIG_Y)
+    draw(_SIG_R_START, _SIG_CAPTION_Y, "Customer Signature")
+    
+    c.restoreState()
+
 def generate_pdf(voucher_id, customer_name, contact_number, units,
                  particulars, problem, staff_name, status, created_at, recipient):
-    os.makedirs(PDF_DIR, exist_ok=True)
+    os.makedirs(PDF_DIR, exist_ok=True)  # may have been removed while the app runs
     final_pdf = os.path.join(PDF_DIR, f"voucher_{voucher_id}.pdf")
     tmp_pdf = final_pdf + ".part"
     
     try:
-        c = rl_canvas.Canvas(tmp_pdf, pagesize=A4)
-        width, height = A4
-        left, right = 12 * mm, width - 12 * mm
-        top_y = height - 15 * mm
-        
-        # Header
-        if LOGO_PATH and os.path.exists(LOGO_PATH):
-            try:
-                c.drawImage(LOGO_PATH, right - 28*mm, top_y - 18*mm, 28*mm, 18*mm, mask='auto')
-            except: pass
-            
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(left, top_y, SHOP_NAME)
-        c.setFont("Helvetica", 9)
-        c.drawString(left, top_y - 5*mm, SHOP_ADDR)
-        c.drawString(left, top_y - 9*mm, SHOP_TEL)
-        
-        c.setFont("Helvetica-Bold", 13)
-        c.drawCentredString(width/2, top_y - 16*mm, "SERVICE VOUCHER")
-        c.drawRightString(right, top_y - 16*mm, f"No : {voucher_id}")
-        
-        # Details
-        y = top_y - 30*mm
-        c.setFont("Helvetica", 10)
-        c.drawString(left, y, f"Customer: {customer_name}")
-        c.drawRightString(right, y, f"Date: {created_at[:10]}")
-        
-        y -= 8*mm
-        c.drawString(left, y, f"Contact: {contact_number}")
-        
-        y -= 15*mm
-        c.rect(left, y - 40*mm, right-left, 45*mm)
-        c.drawString(left + 2*mm, y, "Particulars:")
-        draw_wrapped(c, particulars, left + 2*mm, y - 18*mm, (right-left)/2, 15*mm)
-        
-        c.drawString(left + (right-left)/2 + 2*mm, y, "Problem:")
-        draw_wrapped(c, problem, left + (right-left)/2 + 2*mm, y - 18*mm, (right-left)/2 - 4*mm, 15*mm)
-
-        # Footer
-        y_sig = 30 * mm
-        c.line(left, y_sig, left + 60*mm, y_sig)
-        c.drawString(left, y_sig - 4*mm, "Recipient Signature")
-        
-        c.line(right - 60*mm, y_sig, right, y_sig)
-        c.drawString(right - 60*mm, y_sig - 4*mm, "Customer Signature")
-
+        # Render in memory, then hit the disk with a single write
+        buf = io.BytesIO()
+        c = rl_canvas.Canvas(buf, pagesize=A4)
+        _draw_voucher(c, voucher_id, customer_name, contact_number, units,
+                      particulars, problem, staff_name, status, created_at, recipient)
         c.showPage()
         c.save()
         
-        if os.path.exists(final_pdf): os.remove(final_pdf)
-        os.rename(tmp_pdf, final_pdf)
+        with open(tmp_pdf, "wb") as f:
+            f.write(buf.getbuffer())
+        os.replace(tmp_pdf, final_pdf)
         return final_pdf
     except Exception:
         logger.exception("PDF generation failed")